@@ -441,7 +441,7 @@ class FRRConfig:
         self.original_config = self.imported_config.split('\n')
         self.config = self.original_config.copy()
 
-        for i, e in enumerate(self.imported_config.split('\n')):
+        for i, e in enumerate(self.original_config):
             LOG.debug(f'load_configuration:  loaded    {i:3} {e}')
         return
 
@@ -68,6 +68,22 @@ class TestProtocolsISIS(VyOSUnitTestSHIM.TestCase):
             self.cli_commit()
 
         self.isis_base_config()
+        self.cli_set(base_path + ['redistribute', 'ipv4', 'connected'])
+
+        # verify() - redistribute level-1 or level-2 must be specified
+        with self.assertRaises(ConfigSessionError):
+            self.cli_commit()
+
+        self.cli_set(base_path + ['level', 'level-2'])
+        self.cli_set(base_path + ['redistribute', 'ipv4', 'connected', 'level-1'])
+
+        # verify() - redistribute level-1 can not be used with IS-IS level-2
+        with self.assertRaises(ConfigSessionError):
+            self.cli_commit()
+
+        self.cli_delete(base_path + ['level'])
+        self.cli_delete(base_path + ['redistribute'])
+
         self.cli_set(base_path + ['redistribute', 'ipv4', 'connected', 'level-2', 'route-map', route_map])
         self.cli_set(base_path + ['log-adjacency-changes'])
 
@@ -248,10 +264,26 @@ class TestProtocolsISIS(VyOSUnitTestSHIM.TestCase):
         self.cli_set(base_path + ['net', net])
         self.cli_set(base_path + ['interface', interface])
         self.cli_set(base_path + ['segment-routing', 'maximum-label-depth', maximum_stack_size])
-        self.cli_set(base_path + ['segment-routing', 'global-block', 'low-label-value', global_block_low])
-        self.cli_set(base_path + ['segment-routing', 'global-block', 'high-label-value', global_block_high])
         self.cli_set(base_path + ['segment-routing', 'local-block', 'low-label-value', local_block_low])
         self.cli_set(base_path + ['segment-routing', 'local-block', 'high-label-value', local_block_high])
+
+        # verify() - local-block requires global-block
+        with self.assertRaises(ConfigSessionError):
+            self.cli_commit()
+
+        self.cli_set(base_path + ['segment-routing', 'global-block', 'low-label-value', global_block_low])
+
+        # verify() - global-block requires both low and high value
+        with self.assertRaises(ConfigSessionError):
+            self.cli_commit()
+
+        self.cli_set(base_path + ['segment-routing', 'global-block', 'high-label-value', local_block_low])
+
+        # verify() - local-block must not overlap with global-block
+        with self.assertRaises(ConfigSessionError):
+            self.cli_commit()
+
+        self.cli_set(base_path + ['segment-routing', 'global-block', 'high-label-value', global_block_high])
         self.cli_set(base_path + ['segment-routing', 'prefix', prefix_one, 'index', 'value', prefix_one_value])
         self.cli_set(base_path + ['segment-routing', 'prefix', prefix_one, 'index', 'explicit-null'])
         self.cli_set(base_path + ['segment-routing', 'prefix', prefix_two, 'index', 'value', prefix_two_value])
@@ -318,5 +350,34 @@ class TestProtocolsISIS(VyOSUnitTestSHIM.TestCase):
             self.assertIn(f' ipv6 router isis {domain}', tmp)
             self.assertIn(f' no isis mpls ldp-sync', tmp)
 
+    def test_isis_09_verify_removed_interface(self):
+        # verify() must always check the live system state, an identical
+        # IS-IS configuration has to be rejected once its interface is gone
+        interface = 'dum4711'
+        dummy_path = ['interfaces', 'dummy', interface]
+
+        self.cli_set(dummy_path)
+        self.cli_commit()
+
+        self.cli_set(base_path + ['net', net])
+        self.cli_set(base_path + ['interface', interface])
+        self.cli_commit()
+
+        tmp = self.getFRRconfig(f'interface {interface}', daemon='isisd')
+        self.assertIn(f' ip router isis {domain}', tmp)
+
+        self.cli_delete(base_path)
+        self.cli_commit()
+
+        self.cli_delete(dummy_path)
+        self.cli_commit()
+
+        self.cli_set(base_path + ['net', net])
+        self.cli_set(base_path + ['interface', interface])
+
+        # verify() - interface does not exist
+        with self.assertRaises(ConfigSessionError):
+            self.cli_commit()
+
 if __name__ == '__main__':
     unittest.main(verbosity=2)
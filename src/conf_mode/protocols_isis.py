@@ -15,24 +15,51 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
 
+from hashlib import blake2b
+from json import dumps as json_write
 from sys import exit
 from sys import argv
 
 from vyos.config import Config
 from vyos.configdict import dict_merge
-from vyos.configdict import node_changed
 from vyos.configverify import verify_common_route_maps
 from vyos.configverify import verify_interface_exists
 from vyos.ifconfig import Interface
-from vyos.util import dict_search
-from vyos.util import get_interface_config
-from vyos.template import render_to_string
+from vyos.util import read_file
+from vyos.util import write_file
 from vyos.xml import defaults
 from vyos import ConfigError
-from vyos import frr
 from vyos import airbag
-airbag.enable()
+
+# Digest of the IS-IS configuration last committed to FRR, per VRF instance
+isis_hash_file = '/run/vyos/isis.{vrf}.hash'
+
+def _iface_masters():
+    """ Return a dict mapping each interface name to its master device
+    (VRF, bridge, bond) - a single sysfs scan instead of one "ip link" per
+    interface. """
+    masters = {}
+    with os.scandir('/sys/class/net') as it:
+        for entry in it:
+            try:
+                masters[entry.name] = os.path.basename(os.readlink(f'{entry.path}/master'))
+            except OSError:
+                pass
+    return masters
+
+def _config_hash(isis):
+    """ Return a stable digest of the IS-IS configuration dictionary """
+    tmp = json_write(isis, sort_keys=True).encode()
+    return blake2b(tmp, digest_size=16).hexdigest()
+
+def _removed_ifaces(conf, base):
+    """ Return interfaces present in the running but not in the proposed
+    configuration - a plain set difference instead of a full config diff """
+    path = base + ['interface']
+    candidate = set(conf.list_nodes(path))
+    return [i for i in conf.list_effective_nodes(path) if i not in candidate]
 
 def get_config(config=None):
     if config:
@@ -60,9 +87,9 @@ def get_config(config=None):
     # to VRFs - or the global VRF, we need to check for changed interfaces so
     # that they will be properly rendered for the FRR config. Also this eases
     # removal of interfaces from the running configuration.
-    interfaces_removed = node_changed(conf, base + ['interface'])
+    interfaces_removed = _removed_ifaces(conf, base)
     if interfaces_removed:
-        isis['interface_removed'] = list(interfaces_removed)
+        isis['interface_removed'] = interfaces_removed
 
     # Bail out early if configuration tree does not exist
     if not conf.exists(base):
@@ -87,6 +114,10 @@ def get_config(config=None):
     # Merge policy dict into "regular" config dict
     isis = dict_merge(tmp, isis)
 
+    # Digest of the final dictionary, generate() compares it against the one
+    # of the last successful commit
+    isis['config_hash'] = _config_hash(isis)
+
     return isis
 
 def verify(isis):
@@ -108,6 +139,9 @@ def verify(isis):
     if 'interface' not in isis:
         raise ConfigError('Interface used for routing updates is mandatory!')
 
+    if 'vrf' in isis:
+        masters = _iface_masters()
+
     for interface in isis['interface']:
         verify_interface_exists(interface)
         # Interface MTU must be >= configured lsp-mtu
@@ -127,8 +161,7 @@ def verify(isis):
             # priorities the interface is bound to the VRF after creation of
             # the VRF itself, and before any routing protocol is configured.
             vrf = isis['vrf']
-            tmp = get_interface_config(interface)
-            if 'master' not in tmp or tmp['master'] != vrf:
+            if masters.get(interface) != vrf:
                 raise ConfigError(f'Interface "{interface}" is not a member of VRF "{vrf}"!')
 
     # If md5 and plaintext-password set at the same time
@@ -140,73 +173,78 @@ def verify(isis):
 
     # If one param from delay set, but not set others
     if 'spf_delay_ietf' in isis:
-        required_timers = ['holddown', 'init_delay', 'long_delay', 'short_delay', 'time_to_learn']
-        exist_timers = []
-        for elm_timer in required_timers:
-            if elm_timer in isis['spf_delay_ietf']:
-                exist_timers.append(elm_timer)
-
-        exist_timers = set(required_timers).difference(set(exist_timers))
-        if len(exist_timers) > 0:
-            raise ConfigError('All types of spf-delay must be configured. Missing: ' + ', '.join(exist_timers).replace('_', '-'))
+        required_timers = {'holddown', 'init_delay', 'long_delay', 'short_delay', 'time_to_learn'}
+        missing_timers = required_timers - isis['spf_delay_ietf'].keys()
+        if missing_timers:
+            raise ConfigError('All types of spf-delay must be configured. Missing: ' + ', '.join(sorted(missing_timers)).replace('_', '-'))
 
     # If Redistribute set, but level don't set
     if 'redistribute' in isis:
+        redistribute = isis['redistribute']
         proc_level = isis.get('level','').replace('-','_')
+        # Only a process restricted to a single level limits redistribution
+        check_level = proc_level and proc_level != 'level_1_2'
+        # CLI path of this IS-IS instance used in error messages
+        cli_base = 'protocols isis'
+        if 'vrf' in isis:
+            cli_base = f'vrf name {isis["vrf"]} {cli_base}'
         for afi in ['ipv4', 'ipv6']:
-            if afi not in isis['redistribute']:
+            if afi not in redistribute:
                 continue
 
-            for proto, proto_config in isis['redistribute'][afi].items():
+            for proto, proto_config in redistribute[afi].items():
                 if 'level_1' not in proto_config and 'level_2' not in proto_config:
                     raise ConfigError(f'Redistribute level-1 or level-2 should be specified in ' \
-                                      f'"protocols isis {process} redistribute {afi} {proto}"!')
+                                      f'"{cli_base} redistribute {afi} {proto}"!')
 
-                for redistr_level, redistr_config in proto_config.items():
-                    if proc_level and proc_level != 'level_1_2' and proc_level != redistr_level:
-                        raise ConfigError(f'"protocols isis {process} redistribute {afi} {proto} {redistr_level}" ' \
-                                          f'can not be used with \"protocols isis {process} level {proc_level}\"')
+                if not check_level:
+                    continue
 
-    # Segment routing checks
-    if dict_search('segment_routing.global_block', isis):
-        g_high_label_value = dict_search('segment_routing.global_block.high_label_value', isis)
-        g_low_label_value = dict_search('segment_routing.global_block.low_label_value', isis)
+                for redistr_level in proto_config:
+                    if proc_level != redistr_level:
+                        tmp = redistr_level.replace('_', '-')
+                        raise ConfigError(f'"{cli_base} redistribute {afi} {proto} {tmp}" can not ' \
+                                          f'be used with "{cli_base} level {isis["level"]}"')
 
-        # If segment routing global block high or low value is blank, throw error
-        if not (g_low_label_value or g_high_label_value):
-            raise ConfigError('Segment routing global-block requires both low and high value!')
+    # Segment routing checks
+    sr = isis.get('segment_routing') or {}
+    label_range = {}
+    for block in ['global_block', 'local_block']:
+        block_config = sr.get(block)
+        if not block_config:
+            continue
 
-        # If segment routing global block low value is higher than the high value, throw error
-        if int(g_low_label_value) > int(g_high_label_value):
-            raise ConfigError('Segment routing global-block low value must be lower than high value')
+        tmp = block.replace('_', '-')
+        if block == 'local_block' and 'global_block' not in label_range:
+            raise ConfigError(f'Segment routing {tmp} requires global-block to be configured!')
 
-    if dict_search('segment_routing.local_block', isis):
-        if dict_search('segment_routing.global_block', isis) == None:
-            raise ConfigError('Segment routing local-block requires global-block to be configured!')
+        low = block_config.get('low_label_value')
+        high = block_config.get('high_label_value')
 
-        l_high_label_value = dict_search('segment_routing.local_block.high_label_value', isis)
-        l_low_label_value = dict_search('segment_routing.local_block.low_label_value', isis)
+        # If segment routing block high or low value is blank, throw error
+        if not (low and high):
+            raise ConfigError(f'Segment routing {tmp} requires both low and high value!')
 
-        # If segment routing local-block high or low value is blank, throw error
-        if not (l_low_label_value or l_high_label_value):
-            raise ConfigError('Segment routing local-block requires both high and low value!')
+        # If segment routing block low value is higher than the high value, throw error
+        low, high = int(low), int(high)
+        if low > high:
+            raise ConfigError(f'Segment routing {tmp} low value must be lower than high value')
 
-        # If segment routing local-block low value is higher than the high value, throw error
-        if int(l_low_label_value) > int(l_high_label_value):
-            raise ConfigError('Segment routing local-block low value must be lower than high value')
+        label_range[block] = (low, high)
 
+    if 'local_block' in label_range:
         # local-block most live outside global block
-        global_range = range(int(g_low_label_value), int(g_high_label_value) +1)
-        local_range  = range(int(l_low_label_value), int(l_high_label_value) +1)
+        g_low, g_high = label_range['global_block']
+        l_low, l_high = label_range['local_block']
 
         # Check for overlapping ranges
-        if list(set(global_range) & set(local_range)):
-            raise ConfigError(f'Segment-Routing Global Block ({g_low_label_value}/{g_high_label_value}) '\
-                              f'conflicts with Local Block ({l_low_label_value}/{l_high_label_value})!')
+        if l_low <= g_high and g_low <= l_high:
+            raise ConfigError(f'Segment-Routing Global Block ({g_low}/{g_high}) '\
+                              f'conflicts with Local Block ({l_low}/{l_high})!')
 
     # Check for a blank or invalid value per prefix
-    if dict_search('segment_routing.prefix', isis):
-        for prefix, prefix_config in isis['segment_routing']['prefix'].items():
+    if 'prefix' in sr:
+        for prefix, prefix_config in sr['prefix'].items():
             if 'absolute' in prefix_config:
                 if prefix_config['absolute'].get('value') is None:
                     raise ConfigError(f'Segment routing prefix {prefix} absolute value cannot be blank.')
@@ -215,8 +253,8 @@ def verify(isis):
                     raise ConfigError(f'Segment routing prefix {prefix} index value cannot be blank.')
 
     # Check for explicit-null and no-php-flag configured at the same time per prefix
-    if dict_search('segment_routing.prefix', isis):
-        for prefix, prefix_config in isis['segment_routing']['prefix'].items():
+    if 'prefix' in sr:
+        for prefix, prefix_config in sr['prefix'].items():
             if 'absolute' in prefix_config:
                 if ("explicit_null" in prefix_config['absolute']) and ("no_php_flag" in prefix_config['absolute']):
                     raise ConfigError(f'Segment routing prefix {prefix} cannot have both explicit-null '\
@@ -232,10 +270,23 @@ def generate(isis):
     if not isis or 'deleted' in isis:
         return None
 
+    # Nothing changed since the last successful commit of this instance, there
+    # is no need to re-render the configuration or to reload FRR
+    hash_file = isis_hash_file.format(vrf=isis.get('vrf', 'default'))
+    if read_file(hash_file, defaultonfailure='') == isis['config_hash']:
+        isis.update({'skip_apply' : ''})
+        return None
+
+    from vyos.template import render_to_string
     isis['frr_isisd_config'] = render_to_string('frr/isisd.frr.j2', isis)
     return None
 
 def apply(isis):
+    if 'skip_apply' in isis:
+        return None
+
+    from vyos import frr
+
     isis_daemon = 'isisd'
 
     # Save original configuration prior to starting any commit actions
@@ -248,23 +299,31 @@ def apply(isis):
         vrf = ' vrf ' + isis['vrf']
 
     frr_cfg.load_configuration(isis_daemon)
-    frr_cfg.modify_section(f'^router isis VyOS{vrf}', stop_pattern='^exit', remove_stop_mark=True)
-
-    for key in ['interface', 'interface_removed']:
-        if key not in isis:
-            continue
-        for interface in isis[key]:
-            frr_cfg.modify_section(f'^interface {interface}{vrf}', stop_pattern='^exit', remove_stop_mark=True)
+    # Remove the router section and all (removed) interface sections in a
+    # single pass over the running configuration by using one alternation
+    # pattern instead of one modify_section() call per section
+    sections = ['router isis VyOS']
+    interfaces = [*isis.get('interface', []), *isis.get('interface_removed', [])]
+    if interfaces:
+        sections.append('interface (?:' + '|'.join(map(re.escape, interfaces)) + ')')
+    frr_cfg.modify_section(f'^(?:{"|".join(sections)}){vrf}', stop_pattern='^exit', remove_stop_mark=True)
 
     if 'frr_isisd_config' in isis:
         frr_cfg.add_before(frr.default_add_before, isis['frr_isisd_config'])
 
     frr_cfg.commit_configuration(isis_daemon)
 
+    hash_file = isis_hash_file.format(vrf=isis.get('vrf', 'default'))
+    if 'config_hash' in isis:
+        write_file(hash_file, isis['config_hash'])
+    elif os.path.isfile(hash_file):
+        os.unlink(hash_file)
+
     return None
 
 if __name__ == '__main__':
     try:
+        airbag.enable()
         c = get_config()
         verify(c)
         generate(c)